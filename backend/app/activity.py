@@ -0,0 +1,235 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import and_, case, func, inspect, or_, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+from . import models
+from .cache import bump_table_version
+from .db import ensure_indexes
+
+ACTIVITY_CHECK_BATCH_SIZE = int(os.getenv("ACTIVITY_CHECK_BATCH_SIZE", "1000"))
+
+
+ACTIVITY_COLUMNS = ("open_tickets", "total_tickets", "last_ticket_at")
+ACTIVITY_INDEXES = (
+    (models.Client, ("ix_clients_last_ticket_at",)),
+    (models.Ticket, ("ix_tickets_client_id",)),
+)
+
+
+def is_open(status: str) -> bool:
+    return status != "closed"
+
+
+# ===== Миграция существующей базы =====
+# create_all не трогает уже созданные таблицы, поэтому колонки сводки
+# и индексы под неё добавляем сами; повторный запуск ничего не делает.
+
+def _client_columns(bind) -> set:
+    return {col["name"] for col in inspect(bind).get_columns(models.Client.__tablename__)}
+
+
+def ensure_activity_columns(db: Session):
+    bind = db.get_bind()
+    table = models.Client.__table__
+    added = False
+    for name in ACTIVITY_COLUMNS:
+        if name in _client_columns(bind):
+            continue
+        column_ddl = CreateColumn(table.c[name]).compile(dialect=bind.dialect)
+        try:
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+            added = True
+        except DBAPIError:
+            # другой воркер мог добавить колонку одновременно с нами
+            if name not in _client_columns(bind):
+                raise
+
+    for model, index_names in ACTIVITY_INDEXES:
+        ensure_indexes(bind, model, index_names)
+
+    if added:
+        # у старых клиентов сводка пустая — заполняем её той же починкой
+        check_client_activity(db, repair=True)
+
+
+# ===== Обновление сводки в транзакциях тикетов =====
+# Все изменения — атомарные UPDATE со смещениями, поэтому параллельные запросы
+# не теряют инкременты. last_ticket_at копируем подзапросом из самого тикета,
+# чтобы значение совпадало с tickets.updated_at байт в байт.
+
+def _last_updated_at(ticket_ids: List[int]):
+    return (
+        select(func.max(models.Ticket.updated_at))
+        .where(models.Ticket.id.in_(ticket_ids))
+        .scalar_subquery()
+    )
+
+
+def on_ticket_created(db: Session, ticket: models.Ticket):
+    db.flush()
+    db.query(models.Client).filter(models.Client.id == ticket.client_id).update(
+        {
+            models.Client.total_tickets: models.Client.total_tickets + 1,
+            models.Client.open_tickets: models.Client.open_tickets + int(is_open(ticket.status)),
+            models.Client.last_ticket_at: _last_updated_at([ticket.id]),
+        },
+        synchronize_session=False,
+    )
+
+
+def on_tickets_status_changed(db: Session, changes: List[tuple]):
+    # changes: [(ticket, старый статус), ...] — новый статус уже выставлен в ticket.
+    # Тикеты без смены статуса пропускаем: их updated_at остался старым,
+    # и подзапрос откатил бы last_ticket_at клиента назад.
+    db.flush()
+    per_client: Dict[int, List[int]] = defaultdict(list)
+    open_delta: Dict[int, int] = defaultdict(int)
+    for ticket, old_status in changes:
+        if ticket.status == old_status:
+            continue
+        per_client[ticket.client_id].append(ticket.id)
+        open_delta[ticket.client_id] += int(is_open(ticket.status)) - int(is_open(old_status))
+
+    for client_id, ticket_ids in per_client.items():
+        db.query(models.Client).filter(models.Client.id == client_id).update(
+            {
+                models.Client.open_tickets: models.Client.open_tickets + open_delta[client_id],
+                models.Client.last_ticket_at: _last_updated_at(ticket_ids),
+            },
+            synchronize_session=False,
+        )
+
+
+# ===== Проверка и починка =====
+
+def check_client_activity(db: Session, repair: bool = False) -> dict:
+    # идём по клиентам батчами по id и сверяем сводку с агрегатом по tickets
+    checked = 0
+    repaired = 0
+    mismatched: List[int] = []
+    last_id = 0
+
+    while True:
+        clients = (
+            db.query(models.Client)
+            .filter(models.Client.id > last_id)
+            .order_by(models.Client.id)
+            .limit(ACTIVITY_CHECK_BATCH_SIZE)
+            .all()
+        )
+        if not clients:
+            break
+        last_id = clients[-1].id
+        checked += len(clients)
+
+        t = models.Ticket
+        actual = {
+            client_id: (total, open_count or 0, last_at)
+            for client_id, total, open_count, last_at in (
+                db.query(
+                    t.client_id,
+                    func.count(t.id),
+                    func.sum(case((t.status != "closed", 1), else_=0)),
+                    func.max(t.updated_at),
+                )
+                .filter(t.client_id.in_([c.id for c in clients]))
+                .group_by(t.client_id)
+            )
+        }
+
+        broken = []
+        for client in clients:
+            expected = actual.get(client.id, (0, 0, None))
+            if (client.total_tickets, client.open_tickets, client.last_ticket_at) != expected:
+                broken.append(client.id)
+        mismatched.extend(broken)
+
+        if repair and broken:
+            fixed = repair_clients(db, broken)
+            if fixed:
+                # версию двигаем в той же транзакции, что и починку
+                bump_table_version(db, "clients")
+            db.commit()
+            repaired += fixed
+
+    return {
+        "checked": checked,
+        "mismatched": len(mismatched),
+        "repaired": repaired,
+        "sample_ids": mismatched[:20],
+    }
+
+
+def repair_clients(db: Session, client_ids: List[int]) -> int:
+    # возвращает число реально изменённых строк: клиентов, которых уже
+    # поправил параллельный запрос, условие в WHERE отсеет
+    t = models.Ticket
+    c = models.Client
+    total = select(func.count(t.id)).where(t.client_id == c.id).scalar_subquery()
+    open_count = (
+        select(func.count(t.id))
+        .where(t.client_id == c.id, t.status != "closed")
+        .scalar_subquery()
+    )
+    last_at = select(func.max(t.updated_at)).where(t.client_id == c.id).scalar_subquery()
+    return (
+        db.query(c)
+        .filter(
+            c.id.in_(client_ids),
+            or_(
+                c.total_tickets != total,
+                c.open_tickets != open_count,
+                c.last_ticket_at.is_distinct_from(last_at),
+            ),
+        )
+        .update(
+            {c.total_tickets: total, c.open_tickets: open_count, c.last_ticket_at: last_at},
+            synchronize_session=False,
+        )
+    )
+
+
+def repair_job(db: Session, state: models.ScheduledJob, now: datetime, report):
+    report(check_client_activity(db, repair=True)["repaired"])
+
+
+# ===== Список клиентов по последней активности =====
+
+def clients_by_last_activity(db: Session, query, before_id=None, limit=None) -> List[models.Client]:
+    # Две части, каждая — обычный проход по индексу (last_ticket_at, id):
+    # сначала клиенты с тикетами (свежие сверху), потом без тикетов (по id).
+    # NULLS LAST в одном ORDER BY индекс в Postgres не использует.
+    c = models.Client
+    with_tickets = query.filter(c.last_ticket_at.isnot(None))
+    without_tickets = query.filter(c.last_ticket_at.is_(None))
+
+    if before_id:
+        cursor_at = db.query(c.last_ticket_at).filter(c.id == before_id).scalar()
+        if cursor_at is None:
+            with_tickets = None
+            without_tickets = without_tickets.filter(c.id < before_id)
+        else:
+            # сравниваем с подзапросом, а не с параметром: в SQLite формат времени не совпадёт
+            cursor_sub = select(c.last_ticket_at).where(c.id == before_id).scalar_subquery()
+            with_tickets = with_tickets.filter(
+                or_(
+                    c.last_ticket_at < cursor_sub,
+                    and_(c.last_ticket_at == cursor_sub, c.id < before_id),
+                )
+            )
+
+    rows: List[models.Client] = []
+    if with_tickets is not None:
+        q = with_tickets.order_by(c.last_ticket_at.desc(), c.id.desc())
+        rows = q.limit(limit).all() if limit else q.all()
+    if limit is None or len(rows) < limit:
+        q = without_tickets.order_by(c.id.desc())
+        rows += q.limit(limit - len(rows)).all() if limit else q.all()
+    return rows
@@ -0,0 +1,109 @@
+import asyncio
+import math
+import os
+from typing import Dict
+
+from fastapi import HTTPException
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class AdmissionController:
+    # ограничивает число одновременных обращений к БД для класса роутов;
+    # лишние запросы ждут в очереди не дольше deadline, потом получают 503
+
+    def __init__(self, name: str, limit: int, max_queue: int, deadline: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._sem = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.limit and self.waiting > 0
+
+    def _reject(self):
+        self.shed += 1
+        retry_after = max(1, math.ceil(self.deadline))
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server is busy ({self.name}), try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def __call__(self):
+        # используется как FastAPI-зависимость с yield
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self._reject()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            self._reject()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "deadline_sec": self.deadline,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "saturated": self.saturated,
+        }
+
+
+# Отдельные пулы, чтобы дешёвые записи (смена статуса) не стояли за выгрузками
+reads = AdmissionController(
+    "reads",
+    limit=_env_int("ADMISSION_READS_LIMIT", 8),
+    max_queue=_env_int("ADMISSION_READS_QUEUE", 64),
+    deadline=_env_float("ADMISSION_READS_DEADLINE", 2.0),
+)
+writes = AdmissionController(
+    "writes",
+    limit=_env_int("ADMISSION_WRITES_LIMIT", 4),
+    max_queue=_env_int("ADMISSION_WRITES_QUEUE", 64),
+    deadline=_env_float("ADMISSION_WRITES_DEADLINE", 2.0),
+)
+exports = AdmissionController(
+    "exports",
+    limit=_env_int("ADMISSION_EXPORTS_LIMIT", 1),
+    max_queue=_env_int("ADMISSION_EXPORTS_QUEUE", 4),
+    deadline=_env_float("ADMISSION_EXPORTS_DEADLINE", 10.0),
+)
+
+controllers = (reads, writes, exports)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {c.name: c.stats() for c in controllers}
+
+
+def saturated() -> bool:
+    # здоровье инстанса — по дешёвым пулам: занятые выгрузки не повод снимать
+    # с балансировщика воркер, у которого свободны чтения и записи
+    return reads.saturated or writes.saturated
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import insert_missing
+
+# Лимит памяти под кэш ответов (в байтах сериализованных тел)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Таблицы, по которым ведём версии
+VERSIONED_TABLES = ("clients", "tickets")
+
+
+# ===== Версии таблиц =====
+
+def ensure_table_versions(db: Session):
+    # создаём строки-счётчики заранее, чтобы bump был обычным UPDATE
+    insert_missing(
+        db,
+        models.TableVersion,
+        [{"table_name": name, "version": 0} for name in VERSIONED_TABLES],
+    )
+    db.commit()
+
+
+def get_table_versions(db: Session, tables: Iterable[str]) -> Tuple[int, ...]:
+    tables = tuple(tables)
+    rows = (
+        db.query(models.TableVersion)
+        .filter(models.TableVersion.table_name.in_(tables))
+        .all()
+    )
+    versions = {row.table_name: row.version for row in rows}
+    return tuple(versions.get(name, 0) for name in tables)
+
+
+def _increment_version(db: Session, table: str) -> int:
+    return (
+        db.query(models.TableVersion)
+        .filter(models.TableVersion.table_name == table)
+        .update(
+            {models.TableVersion.version: models.TableVersion.version + 1},
+            synchronize_session=False,
+        )
+    )
+
+
+def bump_table_version(db: Session, table: str):
+    # вызывается внутри транзакции записи, коммит делает сам обработчик
+    if not _increment_version(db, table):
+        insert_missing(db, models.TableVersion, [{"table_name": table, "version": 0}])
+        _increment_version(db, table)
+
+
+# ===== LRU-кэш сериализованных ответов =====
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, ...], bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(route: str, params: Mapping[str, Optional[object]]) -> str:
+        # пустые параметры отбрасываем, порядок не важен
+        items = sorted(
+            (k, str(v)) for k, v in params.items() if v is not None and v != ""
+        )
+        query = "&".join(f"{k}={v}" for k, v in items)
+        return f"{route}?{query}"
+
+    def get(self, key: str, versions: Tuple[int, ...]) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_versions, body = entry
+            if entry_versions != versions:
+                # данные поменялись — запись протухла
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, versions: Tuple[int, ...], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (versions, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "miss_ratio": self.misses / total if total else 0.0,
+            }
+
+    def _remove(self, key: str):
+        _, body = self._entries.pop(key)
+        self._size -= len(body)
+
+
+response_cache = ResponseCache()
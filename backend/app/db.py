@@ -2,8 +2,11 @@
 import os
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.schema import CreateIndex
 
 # Путь до корня проекта (папка backend/..)
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,4 +25,30 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def insert_missing(db, model, rows):
+    # INSERT ... ON CONFLICT DO NOTHING: несколько воркеров могут сидировать
+    # одни и те же строки одновременно, проигравший просто ничего не вставит
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(model).values(rows).on_conflict_do_nothing())
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(model).values(rows).on_conflict_do_nothing())
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(model).values(row))
+            except IntegrityError:
+                pass
+
+
+def ensure_indexes(bind, model, names):
+    # create_all не добавляет индексы в уже существующие таблицы —
+    # досоздаём их сами; IF NOT EXISTS переживает параллельный старт воркеров
+    indexes = {index.name: index for index in model.__table__.indexes}
+    with bind.begin() as conn:
+        for name in names:
+            conn.execute(CreateIndex(indexes[name], if_not_exists=True))
@@ -1,14 +1,34 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
 from fastapi import FastAPI, Depends, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from pydantic import TypeAdapter
+from sqlalchemy import or_
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-
-from . import models, schemas
-from .db import engine, Base
+from typing import Callable, List, Optional, Sequence
+
+from . import activity, admission, models, rollups, schemas
+from .cache import (
+    bump_table_version,
+    ensure_table_versions,
+    get_table_versions,
+    response_cache,
+)
+from .db import engine, Base, SessionLocal, ensure_indexes
 from .deps import get_db
+from .scheduler import SCHEDULER_ENABLED, scheduler_loop
 
 # Создаём таблицы (на старте)
 Base.metadata.create_all(bind=engine)
+# индексы под скан правил планировщика (status, updated_at, id)
+# и под постраничный список /tickets?status= (status, id)
+ensure_indexes(engine, models.Ticket, ("ix_tickets_status_updated_at", "ix_tickets_status_id"))
+
+with SessionLocal() as _db:
+    ensure_table_versions(_db)
+    activity.ensure_activity_columns(_db)
 
 app = FastAPI(
     title="JMih CRM API",
@@ -16,31 +36,138 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+async def start_scheduler():
+    if SCHEDULER_ENABLED:
+        app.state.scheduler_task = asyncio.create_task(scheduler_loop())
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    task = getattr(app.state, "scheduler_task", None)
+    if task:
+        task.cancel()
+
+
 @app.get("/ping")
 def ping():
+    # под перегрузкой честно отвечаем 503, чтобы балансировщик снял нагрузку
+    if admission.saturated():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "overloaded", "admission": admission.stats()},
+            headers={"Retry-After": "1"},
+        )
     return {"status": "ok"}
 
 
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+
+def cached_json(
+    db: Session,
+    route: str,
+    params: dict,
+    tables: Sequence[str],
+    build: Callable[[], bytes],
+) -> Response:
+    # версии читаем до запроса данных: если запись пройдёт между ними,
+    # в кэш попадёт старая версия и следующий запрос просто промахнётся
+    versions = get_table_versions(db, tables)
+    key = response_cache.make_key(route, params)
+
+    body = response_cache.get(key, versions)
+    if body is not None:
+        return Response(body, media_type="application/json", headers={"X-Cache": "HIT"})
+
+    body = build()
+    response_cache.put(key, versions, body)
+    return Response(body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+
+clients_adapter = TypeAdapter(List[schemas.Client])
+tickets_adapter = TypeAdapter(List[schemas.Ticket])
+
+
+def dump_list(adapter: TypeAdapter, rows) -> bytes:
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
 # ===== Клиенты =====
 
-@app.post("/clients", response_model=schemas.Client)
+@app.post(
+    "/clients",
+    response_model=schemas.Client,
+    dependencies=[Depends(admission.writes)],
+)
 def create_client(client_in: schemas.ClientCreate, db: Session = Depends(get_db)):
     client = models.Client(**client_in.dict())
     db.add(client)
+    bump_table_version(db, "clients")
     db.commit()
     db.refresh(client)
     return client
 
 
-@app.get("/clients", response_model=List[schemas.Client])
-def list_clients(db: Session = Depends(get_db)):
-    clients = db.query(models.Client).order_by(models.Client.id.desc()).all()
-    return clients
+@app.get(
+    "/clients",
+    response_model=List[schemas.Client],
+    dependencies=[Depends(admission.reads)],
+)
+def list_clients(
+    q: Optional[str] = Query(None, description="поиск по имени / телефону"),
+    before_id: Optional[int] = Query(None, description="курсор: id последнего клиента прошлой страницы"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    sort: str = Query("id", pattern="^(id|last_activity)$"),
+    db: Session = Depends(get_db),
+):
+    def build() -> bytes:
+        query = db.query(models.Client)
+        if q:
+            # % и _ из ввода ищем буквально, а не как шаблон LIKE
+            escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            query = query.filter(
+                or_(
+                    models.Client.name.ilike(pattern, escape="\\"),
+                    models.Client.phone.ilike(pattern, escape="\\"),
+                )
+            )
+
+        if sort == "last_activity":
+            clients = activity.clients_by_last_activity(db, query, before_id, limit)
+            return dump_list(clients_adapter, clients)
+
+        query = query.order_by(models.Client.id.desc())
+        if before_id:
+            query = query.filter(models.Client.id < before_id)
+        if limit:
+            query = query.limit(limit)
+        return dump_list(clients_adapter, query.all())
+
+    return cached_json(
+        db,
+        "/clients",
+        {"q": q, "before_id": before_id, "limit": limit, "sort": sort},
+        ("clients",),
+        build,
+    )
 
 
 # ===== Тикеты (обращения) =====
 
-@app.post("/tickets", response_model=schemas.Ticket)
+@app.post(
+    "/tickets",
+    response_model=schemas.Ticket,
+    dependencies=[Depends(admission.writes)],
+)
 def create_ticket(ticket_in: schemas.TicketCreate, db: Session = Depends(get_db)):
     # проверяем, что клиент существует
     client = db.query(models.Client).filter(models.Client.id == ticket_in.client_id).first()
@@ -53,32 +180,60 @@ def create_ticket(ticket_in: schemas.TicketCreate, db: Session = Depends(get_db)
         last_comment=ticket_in.last_comment,
     )
     db.add(ticket)
+    activity.on_ticket_created(db, ticket)
+    bump_table_version(db, "tickets")
+    bump_table_version(db, "clients")
     db.commit()
     db.refresh(ticket)
     return ticket
 
 
-@app.get("/tickets", response_model=List[schemas.Ticket])
+@app.get(
+    "/tickets",
+    response_model=List[schemas.Ticket],
+    dependencies=[Depends(admission.reads)],
+)
 def list_tickets(
     status: Optional[str] = Query(None),
     client_id: Optional[int] = Query(None),
+    before_id: Optional[int] = Query(None, description="курсор: id последнего тикета прошлой страницы"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: Session = Depends(get_db),
 ):
-    q = (
-        db.query(models.Ticket)
-        .options(joinedload(models.Ticket.client))
-        .order_by(models.Ticket.created_at.desc())
+    def build() -> bytes:
+        # id растёт вместе с created_at, поэтому сортируем по нему — так работает курсор
+        q = (
+            db.query(models.Ticket)
+            .options(joinedload(models.Ticket.client))
+            .order_by(models.Ticket.id.desc())
+        )
+
+        if status:
+            q = q.filter(models.Ticket.status == status)
+        if client_id:
+            q = q.filter(models.Ticket.client_id == client_id)
+        if before_id:
+            q = q.filter(models.Ticket.id < before_id)
+        if limit:
+            q = q.limit(limit)
+
+        return dump_list(tickets_adapter, q.all())
+
+    # в тикетах отдаём и данные клиента, поэтому зависим от обеих таблиц
+    return cached_json(
+        db,
+        "/tickets",
+        {"status": status, "client_id": client_id, "before_id": before_id, "limit": limit},
+        ("tickets", "clients"),
+        build,
     )
 
-    if status:
-        q = q.filter(models.Ticket.status == status)
-    if client_id:
-        q = q.filter(models.Ticket.client_id == client_id)
-
-    return q.all()
-
 
-@app.patch("/tickets/{ticket_id}/status", response_model=schemas.Ticket)
+@app.patch(
+    "/tickets/{ticket_id}/status",
+    response_model=schemas.Ticket,
+    dependencies=[Depends(admission.writes)],
+)
 def change_ticket_status(
     ticket_id: int,
     status_in: schemas.TicketStatusUpdate,
@@ -88,541 +243,107 @@ def change_ticket_status(
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
 
+    old_status = ticket.status
+    if status_in.status == old_status:
+        # тот же статус: UPDATE не уходит, updated_at не меняется — и сводку не трогаем
+        return ticket
+
     ticket.status = status_in.status
+    activity.on_tickets_status_changed(db, [(ticket, old_status)])
+    bump_table_version(db, "tickets")
+    bump_table_version(db, "clients")
     db.commit()
     db.refresh(ticket)
     return ticket
 
 
+# ===== Фоновые задачи =====
+
+@app.get(
+    "/scheduler/runs",
+    response_model=List[schemas.JobRun],
+    dependencies=[Depends(admission.reads)],
+)
+def list_job_runs(
+    job_name: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    q = db.query(models.JobRun).order_by(models.JobRun.id.desc())
+    if job_name:
+        q = q.filter(models.JobRun.job_name == job_name)
+    return q.limit(limit).all()
+
+
+@app.get(
+    "/clients/activity/check",
+    dependencies=[Depends(admission.exports)],
+)
+def check_client_activity(db: Session = Depends(get_db)):
+    # сверка денормализованной сводки клиентов с таблицей tickets, только чтение
+    return activity.check_client_activity(db)
+
+
+@app.post(
+    "/clients/activity/repair",
+    dependencies=[Depends(admission.exports)],
+)
+def repair_client_activity(db: Session = Depends(get_db)):
+    # та же сверка, расхождения пересчитываются; версия clients двигается в каждом батче
+    return activity.check_client_activity(db, repair=True)
+
+
+# ===== Аналитика (по дневным агрегатам) =====
+
+def analytics_range(date_from: Optional[date], date_to: Optional[date], period: str):
+    # по умолчанию — последние 30 дней (по UTC, как и created_at в агрегатах)
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    # начало выравниваем на границу недели/месяца, чтобы первая корзина не была неполной
+    return rollups.period_start(date_from, period), date_to
+
+
+@app.get(
+    "/analytics/clients",
+    response_model=List[schemas.ClientAcquisitionRow],
+    dependencies=[Depends(admission.reads)],
+)
+def analytics_clients(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    period: str = Query("day", pattern="^(day|week|month)$"),
+    source: Optional[str] = Query(None),
+    city: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    date_from, date_to = analytics_range(date_from, date_to, period)
+    return rollups.client_acquisition(db, date_from, date_to, period, source, city)
+
+
+@app.get(
+    "/analytics/tickets",
+    response_model=List[schemas.TicketVolumeRow],
+    dependencies=[Depends(admission.reads)],
+)
+def analytics_tickets(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    period: str = Query("day", pattern="^(day|week|month)$"),
+    type: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    date_from, date_to = analytics_range(date_from, date_to, period)
+    return rollups.ticket_volume(db, date_from, date_to, period, type)
+
+
 # ===== Мини-приложение (webapp) =====
 
+WEBAPP_HTML = (Path(__file__).resolve().parent / "templates" / "webapp.html").read_text(encoding="utf-8")
+
+
 @app.get("/webapp", response_class=HTMLResponse)
 def webapp():
     # Простой HTML + JS, который работает и в браузере, и в Telegram WebApp
-    return """
-<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8" />
-    <title>JMih CRM</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <style>
-        body {
-            font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-            margin: 0;
-            padding: 16px;
-            background: #0b0f10;
-            color: #f5f5f5;
-        }
-        h1 {
-            font-size: 20px;
-            margin-bottom: 12px;
-        }
-        .subtitle {
-            font-size: 13px;
-            color: #9ca3af;
-            margin-bottom: 16px;
-        }
-        .container {
-            display: flex;
-            flex-direction: column;
-            gap: 16px;
-        }
-        .card {
-            border-radius: 12px;
-            padding: 12px 14px;
-            background: #111827;
-            box-shadow: 0 4px 10px rgba(0,0,0,0.4);
-        }
-        .card h2 {
-            font-size: 16px;
-            margin: 0 0 8px;
-        }
-        label {
-            display: block;
-            font-size: 13px;
-            margin-bottom: 4px;
-        }
-        input, select {
-            width: 100%;
-            box-sizing: border-box;
-            padding: 8px 10px;
-            border-radius: 8px;
-            border: 1px solid #374151;
-            background: #020617;
-            color: #f9fafb;
-            font-size: 14px;
-            margin-bottom: 8px;
-        }
-        input::placeholder {
-            color: #6b7280;
-        }
-        button {
-            width: 100%;
-            padding: 10px 12px;
-            border-radius: 10px;
-            border: none;
-            font-size: 14px;
-            font-weight: 600;
-            cursor: pointer;
-            background: #22c55e;
-            color: #022c22;
-        }
-        button:disabled {
-            opacity: 0.6;
-            cursor: default;
-        }
-        .clients-list,
-        .tickets-list {
-            max-height: 260px;
-            overflow-y: auto;
-        }
-        .client-item,
-        .ticket-item {
-            padding: 8px 8px;
-            border-radius: 8px;
-            background: #020617;
-            border: 1px solid #111827;
-            margin-bottom: 6px;
-            font-size: 13px;
-        }
-        .client-item .name,
-        .ticket-item .title {
-            font-weight: 600;
-        }
-        .client-item .meta,
-        .ticket-item .meta {
-            color: #9ca3af;
-            font-size: 12px;
-            margin-top: 2px;
-        }
-        .status-bar {
-            font-size: 12px;
-            color: #9ca3af;
-            margin-top: 4px;
-        }
-        .ticket-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        .badge {
-            padding: 2px 8px;
-            border-radius: 999px;
-            font-size: 11px;
-            text-transform: uppercase;
-            letter-spacing: 0.03em;
-        }
-        .badge-new {
-            background: rgba(34, 197, 94, 0.16);
-            color: #4ade80;
-        }
-        .badge-in_progress {
-            background: rgba(59, 130, 246, 0.16);
-            color: #60a5fa;
-        }
-        .badge-waiting {
-            background: rgba(245, 158, 11, 0.16);
-            color: #fbbf24;
-        }
-        .badge-closed {
-            background: rgba(148, 163, 184, 0.16);
-            color: #e5e7eb;
-        }
-        .ticket-actions {
-            margin-top: 6px;
-            display: flex;
-            gap: 6px;
-        }
-        .ticket-actions button {
-            width: auto;
-            padding: 6px 10px;
-            font-size: 12px;
-        }
-        .btn-secondary {
-            background: #1f2937;
-            color: #e5e7eb;
-        }
-        .filter-row {
-            margin: 6px 0 10px;
-            display: flex;
-            flex-wrap: wrap;
-            gap: 6px;
-        }
-        .filter-btn {
-            padding: 6px 10px;
-            border-radius: 999px;
-            border: none;
-            font-size: 11px;
-            cursor: pointer;
-            background: #020617;
-            color: #e5e7eb;
-        }
-        .filter-btn.active {
-            background: #22c55e;
-            color: #022c22;
-        }
-    </style>
-</head>
-<body>
-    <h1>JMih mini-CRM</h1>
-    <div class="subtitle">
-        Мини-панель для работы с клиентами ЖМЫХ. Добавляй клиентов и накидывай базу, а ниже — тикеты.
-    </div>
-    <div class="container">
-        <div class="card">
-            <h2>Новый клиент</h2>
-            <form id="clientForm">
-                <label>Имя</label>
-                <input type="text" id="name" placeholder="Иван / Ник ЖМЫХ" required />
-
-                <label>Телефон</label>
-                <input type="tel" id="phone" placeholder="79990000000" />
-
-                <label>Город / филиал</label>
-                <input type="text" id="city" placeholder="СПБ / Норильск / Красноярск" />
-
-                <label>Источник</label>
-                <input type="text" id="source" placeholder="QR, реклама, бот, живая точка..." />
-
-                <button type="submit" id="submitBtn">Сохранить клиента</button>
-                <div class="status-bar" id="status"></div>
-            </form>
-        </div>
-
-        <div class="card">
-            <h2>Клиенты</h2>
-            <div class="clients-list" id="clientsList">
-                Загрузка...
-            </div>
-        </div>
-
-        <div class="card">
-            <h2>Новое обращение</h2>
-            <form id="ticketForm">
-                <label>Клиент</label>
-                <select id="ticketClient" required>
-                    <option value="">Выбери клиента...</option>
-                </select>
-
-                <label>Тип</label>
-                <select id="ticketType">
-                    <option value="order">Заказ</option>
-                    <option value="question">Вопрос</option>
-                    <option value="warranty">Гарантия</option>
-                    <option value="job">Работа</option>
-                    <option value="other">Другое</option>
-                </select>
-
-                <label>Комментарий</label>
-                <input type="text" id="ticketComment" placeholder="Что хочет клиент / детали" />
-
-                <button type="submit" id="ticketSubmitBtn">Создать обращение</button>
-                <div class="status-bar" id="ticketStatus"></div>
-            </form>
-        </div>
-
-        <div class="card">
-            <h2>Обращения</h2>
-            <div class="filter-row" id="ticketFilters">
-                <button class="filter-btn active" data-status="">Все</button>
-                <button class="filter-btn" data-status="new">Новые</button>
-                <button class="filter-btn" data-status="in_progress">В работе</button>
-                <button class="filter-btn" data-status="waiting">Ждём клиента</button>
-                <button class="filter-btn" data-status="closed">Закрытые</button>
-            </div>
-            <div class="tickets-list" id="ticketsList">
-                Загрузка...
-            </div>
-        </div>
-    </div>
-
-    <!-- Telegram WebApp SDK (на будущее) -->
-    <script src="https://telegram.org/js/telegram-web-app.js"></script>
-    <script>
-        const apiBase = window.location.origin;
-
-        const clientsListEl = document.getElementById("clientsList");
-        const form = document.getElementById("clientForm");
-        const statusEl = document.getElementById("status");
-        const submitBtn = document.getElementById("submitBtn");
-
-        const ticketsListEl = document.getElementById("ticketsList");
-        const ticketForm = document.getElementById("ticketForm");
-        const ticketStatusEl = document.getElementById("ticketStatus");
-        const ticketClientSelect = document.getElementById("ticketClient");
-        const ticketTypeInput = document.getElementById("ticketType");
-        const ticketCommentInput = document.getElementById("ticketComment");
-        const ticketSubmitBtn = document.getElementById("ticketSubmitBtn");
-        const ticketFiltersEl = document.getElementById("ticketFilters");
-
-        let clientsCache = [];
-        let currentStatusFilter = "";
-
-        // Если открыто в Telegram WebApp — чуть расширяем окно
-        try {
-            if (window.Telegram && window.Telegram.WebApp) {
-                window.Telegram.WebApp.ready();
-                window.Telegram.WebApp.expand();
-            }
-        } catch (e) {
-            console.log("Telegram WebApp init error:", e);
-        }
-
-        async function fetchClients() {
-            clientsListEl.innerHTML = "Загрузка...";
-            try {
-                const res = await fetch(apiBase + "/clients");
-                if (!res.ok) {
-                    throw new Error("Ошибка загрузки");
-                }
-                const data = await res.json();
-                clientsCache = data;
-                renderClients(data);
-                fillTicketClientSelect(data);
-            } catch (err) {
-                console.error(err);
-                clientsListEl.innerHTML = "Не удалось загрузить клиентов";
-            }
-        }
-
-        function renderClients(clients) {
-            if (!clients.length) {
-                clientsListEl.innerHTML = "<span style='color:#9ca3af;font-size:13px;'>Пока пусто. Добавь первого клиента 👇</span>";
-                return;
-            }
-
-            clientsListEl.innerHTML = "";
-            clients.forEach((c) => {
-                const div = document.createElement("div");
-                div.className = "client-item";
-                div.innerHTML = `
-                    <div class="name">${c.name}</div>
-                    <div class="meta">
-                        ${c.phone ? "📞 " + c.phone : ""} 
-                        ${c.city ? " • " + c.city : ""} 
-                        ${c.source ? " • " + c.source : ""}
-                    </div>
-                `;
-                clientsListEl.appendChild(div);
-            });
-        }
-
-        function fillTicketClientSelect(clients) {
-            ticketClientSelect.innerHTML = '<option value="">Выбери клиента...</option>';
-            clients.forEach((c) => {
-                const opt = document.createElement("option");
-                const phoneText = c.phone ? " • " + c.phone : "";
-                const cityText = c.city ? " • " + c.city : "";
-                opt.value = c.id;
-                opt.textContent = `${c.name}${phoneText}${cityText}`;
-                ticketClientSelect.appendChild(opt);
-            });
-        }
-
-        form.addEventListener("submit", async (e) => {
-            e.preventDefault();
-            statusEl.textContent = "";
-            submitBtn.disabled = true;
-
-            const payload = {
-                name: document.getElementById("name").value.trim(),
-                phone: document.getElementById("phone").value.trim() || null,
-                city: document.getElementById("city").value.trim() || null,
-                source: document.getElementById("source").value.trim() || null,
-                tg_id: null
-            };
-
-            if (!payload.name) {
-                statusEl.textContent = "Имя обязательно";
-                submitBtn.disabled = false;
-                return;
-            }
-
-            try {
-                const res = await fetch(apiBase + "/clients", {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify(payload),
-                });
-
-                if (!res.ok) {
-                    throw new Error("Ошибка при сохранении");
-                }
-
-                form.reset();
-                statusEl.textContent = "Клиент сохранён ✅";
-
-                await fetchClients();
-                await fetchTickets();
-            } catch (err) {
-                console.error(err);
-                statusEl.textContent = "Не удалось сохранить клиента";
-            } finally {
-                submitBtn.disabled = false;
-                setTimeout(() => {
-                    statusEl.textContent = "";
-                }, 2000);
-            }
-        });
-
-        // ==== ТИКЕТЫ ====
-
-        async function fetchTickets() {
-            ticketsListEl.innerHTML = "Загрузка...";
-            try {
-                let url = apiBase + "/tickets";
-                if (currentStatusFilter) {
-                    url += "?status=" + encodeURIComponent(currentStatusFilter);
-                }
-                const res = await fetch(url);
-                if (!res.ok) {
-                    throw new Error("Ошибка загрузки тикетов");
-                }
-                const data = await res.json();
-                renderTickets(data);
-            } catch (err) {
-                console.error(err);
-                ticketsListEl.innerHTML = "Не удалось загрузить обращения";
-            }
-        }
-
-        function badgeClass(status) {
-            switch (status) {
-                case "new": return "badge badge-new";
-                case "in_progress": return "badge badge-in_progress";
-                case "waiting": return "badge badge-waiting";
-                case "closed": return "badge badge-closed";
-                default: return "badge badge-new";
-            }
-        }
-
-        function statusLabel(status) {
-            switch (status) {
-                case "new": return "новое";
-                case "in_progress": return "в работе";
-                case "waiting": return "ждём клиента";
-                case "closed": return "закрыто";
-                default: return status;
-            }
-        }
-
-        function renderTickets(tickets) {
-            if (!tickets.length) {
-                ticketsListEl.innerHTML = "<span style='color:#9ca3af;font-size:13px;'>Пока нет обращений. Создай тикет выше ☝️</span>";
-                return;
-            }
-
-            ticketsListEl.innerHTML = "";
-            tickets.forEach((t) => {
-                const div = document.createElement("div");
-                div.className = "ticket-item";
-                const clientName = t.client?.name || ("Клиент #" + t.client_id);
-                const comment = t.last_comment || "Без комментария";
-
-                div.innerHTML = `
-                    <div class="ticket-header">
-                        <div class="title">${clientName}</div>
-                        <div class="${badgeClass(t.status)}">${statusLabel(t.status)}</div>
-                    </div>
-                    <div class="meta">
-                        Тип: ${t.type} • ${comment}
-                    </div>
-                    <div class="ticket-actions">
-                        ${t.status !== "closed" ? '<button class="btn-secondary" onclick="closeTicket(' + t.id + ')">Закрыть</button>' : ""}
-                    </div>
-                `;
-                ticketsListEl.appendChild(div);
-            });
-        }
-
-        ticketForm.addEventListener("submit", async (e) => {
-            e.preventDefault();
-            ticketStatusEl.textContent = "";
-            ticketSubmitBtn.disabled = true;
-
-            const clientId = parseInt(ticketClientSelect.value);
-            if (!clientId) {
-                ticketStatusEl.textContent = "Выбери клиента";
-                ticketSubmitBtn.disabled = false;
-                return;
-            }
-
-            const payload = {
-                client_id: clientId,
-                type: ticketTypeInput.value,
-                last_comment: ticketCommentInput.value.trim() || null
-            };
-
-            try {
-                const res = await fetch(apiBase + "/tickets", {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify(payload),
-                });
-
-                if (!res.ok) {
-                    throw new Error("Ошибка при создании обращения");
-                }
-
-                ticketForm.reset();
-                ticketStatusEl.textContent = "Обращение создано ✅";
-
-                await fetchTickets();
-            } catch (err) {
-                console.error(err);
-                ticketStatusEl.textContent = "Не удалось создать обращение";
-            } finally {
-                ticketSubmitBtn.disabled = false;
-                setTimeout(() => {
-                    ticketStatusEl.textContent = "";
-                }, 2000);
-            }
-        });
-
-        // смена фильтра статуса
-        ticketFiltersEl.addEventListener("click", (e) => {
-            const btn = e.target.closest(".filter-btn");
-            if (!btn) return;
-
-            currentStatusFilter = btn.dataset.status || "";
-
-            ticketFiltersEl.querySelectorAll(".filter-btn").forEach((b) => {
-                b.classList.toggle("active", b === btn);
-            });
-
-            fetchTickets();
-        });
-
-        // Глобальная функция, чтобы можно было вызвать из onclick
-        async function closeTicketInternal(id) {
-            try {
-                const res = await fetch(apiBase + "/tickets/" + id + "/status", {
-                    method: "PATCH",
-                    headers: {
-                        "Content-Type": "application/json",
-                    },
-                    body: JSON.stringify({ status: "closed" }),
-                });
-                if (!res.ok) {
-                    throw new Error("Ошибка при смене статуса");
-                }
-                await fetchTickets();
-            } catch (err) {
-                console.error(err);
-                alert("Не удалось сменить статус");
-            }
-        }
-        window.closeTicket = closeTicketInternal;
-
-        // стартовая загрузка
-        fetchClients();
-        fetchTickets();
-    </script>
-</body>
-</html>
-    """
\ No newline at end of file
+    return WEBAPP_HTML
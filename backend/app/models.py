@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
 from .db import Base
@@ -26,14 +26,24 @@ class Client(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # денормализованная сводка по тикетам, обновляется в тех же транзакциях, что и тикеты
+    open_tickets = Column(Integer, nullable=False, default=0, server_default="0")
+    total_tickets = Column(Integer, nullable=False, default=0, server_default="0")
+    last_ticket_at = Column(DateTime(timezone=True), nullable=True)   # updated_at последнего тикета
+
     tickets = relationship("Ticket", back_populates="client")
 
+    __table_args__ = (
+        # GET /clients?sort=last_activity
+        Index("ix_clients_last_ticket_at", "last_ticket_at", "id"),
+    )
+
 
 class Ticket(Base):
     __tablename__ = "tickets"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
     type = Column(String, nullable=False)                # заказ / вопрос / гарантия / работа и тд
     status = Column(String, default="new")               # new / in_progress / waiting / closed
     assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -48,3 +58,63 @@ class Ticket(Base):
 
     client = relationship("Client", back_populates="tickets")
     assignee = relationship("User", back_populates="tickets")
+
+    __table_args__ = (
+        # для фоновых правил: выборка "в статусе X дольше N" батчами по ключу
+        Index("ix_tickets_status_updated_at", "status", "updated_at", "id"),
+        # постраничный список с фильтром по статусу (курсор по id)
+        Index("ix_tickets_status_id", "status", "id"),
+    )
+
+
+class TableVersion(Base):
+    # счётчик версий таблиц для инвалидации кэша ответов (общий для всех воркеров)
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ScheduledJob(Base):
+    # состояние фоновой задачи: аренда (кто сейчас выполняет) и водяной знак скана
+    __tablename__ = "scheduled_jobs"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    watermark_at = Column(DateTime(timezone=True), nullable=True)
+    watermark_id = Column(Integer, nullable=True)
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_name = Column(String, nullable=False, index=True)
+    worker = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    duration_ms = Column(Integer, nullable=False)
+    rows_touched = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+
+# ===== Дневные агрегаты для аналитики =====
+
+class DailyClientStat(Base):
+    # новые клиенты за день в разрезе источника и города ("" = не указано)
+    __tablename__ = "daily_client_stats"
+
+    day = Column(Date, primary_key=True)
+    source = Column(String, primary_key=True, default="")
+    city = Column(String, primary_key=True, default="")
+    clients = Column(Integer, nullable=False, default=0)
+
+
+class DailyTicketStat(Base):
+    # созданные обращения за день по типу
+    __tablename__ = "daily_ticket_stats"
+
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)
+    tickets = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,161 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+
+from . import models
+
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "5000"))
+
+# не трогаем самые свежие строки: id из последовательности может закоммититься
+# позже соседнего, и водяной знак по id его бы перескочил
+ROLLUP_LAG = timedelta(seconds=int(os.getenv("ROLLUP_LAG_SEC", "60")))
+
+
+def as_date(value) -> date:
+    # SQLite отдаёт date() строкой, Postgres — объектом date
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_start_sql(db: Session, day, period: str):
+    # то же, что period_start, но на стороне БД — группируем и суммируем в SQL
+    if period == "day":
+        return day
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc(period, day), Date)
+    if period == "week":
+        # SQLite: ближайшее воскресенье не раньше day, минус 6 дней — понедельник
+        return func.date(day, "weekday 0", "-6 days")
+    return func.date(day, "start of month")
+
+
+# ===== Инкрементальное обновление по водяному знаку (id) =====
+
+def _refresh(db: Session, state: models.ScheduledJob, now: datetime, report, table, apply_batch):
+    upto = (
+        db.query(func.max(table.id))
+        .filter(table.id > (state.watermark_id or 0), table.created_at <= now - ROLLUP_LAG)
+        .scalar()
+    )
+    if upto is None:
+        return
+
+    last_id = state.watermark_id or 0
+    while last_id < upto:
+        batch_upto = min(last_id + ROLLUP_BATCH_SIZE, upto)
+        processed = apply_batch(db, last_id, batch_upto)
+        # агрегаты и водяной знак коммитим вместе — строки не посчитаются дважды
+        last_id = state.watermark_id = batch_upto
+        db.commit()
+        report(processed)
+
+
+def _apply_clients(db: Session, after_id: int, upto_id: int) -> int:
+    c = models.Client
+    groups = (
+        db.query(func.date(c.created_at), c.source, c.city, func.count(c.id))
+        .filter(c.id > after_id, c.id <= upto_id)
+        .group_by(func.date(c.created_at), c.source, c.city)
+        .all()
+    )
+    total = 0
+    for day, source, city, count in groups:
+        key = (as_date(day), source or "", city or "")
+        stat = db.get(models.DailyClientStat, key)
+        if stat is None:
+            stat = models.DailyClientStat(day=key[0], source=key[1], city=key[2], clients=0)
+            db.add(stat)
+        stat.clients += count
+        total += count
+    return total
+
+
+def _apply_tickets(db: Session, after_id: int, upto_id: int) -> int:
+    t = models.Ticket
+    groups = (
+        db.query(func.date(t.created_at), t.type, func.count(t.id))
+        .filter(t.id > after_id, t.id <= upto_id)
+        .group_by(func.date(t.created_at), t.type)
+        .all()
+    )
+    total = 0
+    for day, ticket_type, count in groups:
+        key = (as_date(day), ticket_type)
+        stat = db.get(models.DailyTicketStat, key)
+        if stat is None:
+            stat = models.DailyTicketStat(day=key[0], type=key[1], tickets=0)
+            db.add(stat)
+        stat.tickets += count
+        total += count
+    return total
+
+
+def refresh_client_rollup(db: Session, state: models.ScheduledJob, now: datetime, report):
+    _refresh(db, state, now, report, models.Client, _apply_clients)
+
+
+def refresh_ticket_rollup(db: Session, state: models.ScheduledJob, now: datetime, report):
+    _refresh(db, state, now, report, models.Ticket, _apply_tickets)
+
+
+# ===== Чтение агрегатов =====
+
+def client_acquisition(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    period: str,
+    source: Optional[str] = None,
+    city: Optional[str] = None,
+) -> List[dict]:
+    stat = models.DailyClientStat
+    start = period_start_sql(db, stat.day, period).label("period_start")
+    q = db.query(start, stat.source, stat.city, func.sum(stat.clients)).filter(
+        stat.day >= date_from,
+        stat.day <= date_to,
+    )
+    if source is not None:
+        q = q.filter(stat.source == source)
+    if city is not None:
+        q = q.filter(stat.city == city)
+    q = q.group_by(start, stat.source, stat.city).order_by(start, stat.source, stat.city)
+
+    return [
+        {"period_start": as_date(day), "source": src or None, "city": cty or None, "clients": count}
+        for day, src, cty, count in q
+    ]
+
+
+def ticket_volume(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    period: str,
+    ticket_type: Optional[str] = None,
+) -> List[dict]:
+    stat = models.DailyTicketStat
+    start = period_start_sql(db, stat.day, period).label("period_start")
+    q = db.query(start, stat.type, func.sum(stat.tickets)).filter(
+        stat.day >= date_from,
+        stat.day <= date_to,
+    )
+    if ticket_type is not None:
+        q = q.filter(stat.type == ticket_type)
+    q = q.group_by(start, stat.type).order_by(start, stat.type)
+
+    return [
+        {"period_start": as_date(day), "type": t, "tickets": count}
+        for day, t, count in q
+    ]
@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload
+
+from . import activity, models
+from .cache import bump_table_version
+from .db import SessionLocal, insert_missing
+from .rollups import refresh_client_rollup, refresh_ticket_rollup
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TICK_SEC = float(os.getenv("SCHEDULER_TICK_SEC", "30"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "200"))
+
+REMIND_NEW_AFTER_HOURS = float(os.getenv("REMIND_NEW_AFTER_HOURS", "4"))
+AUTOCLOSE_WAITING_AFTER_DAYS = float(os.getenv("AUTOCLOSE_WAITING_AFTER_DAYS", "7"))
+
+# куда слать напоминания, если у тикета нет ответственного
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+REMINDER_CHAT_ID = os.getenv("REMINDER_CHAT_ID")
+REMINDER_SEND_TIMEOUT_SEC = float(os.getenv("REMINDER_SEND_TIMEOUT_SEC", "5"))
+# пауза между сообщениями: Telegram режет ботов примерно на 30 сообщений в секунду
+REMINDER_SEND_INTERVAL_SEC = float(os.getenv("REMINDER_SEND_INTERVAL_SEC", "0.1"))
+
+# запас до конца аренды: новый батч / отправку не начинаем, если можем не успеть
+LEASE_MARGIN_SEC = 30
+
+# id воркера для аренды задач (несколько uvicorn-воркеров / хостов)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Rule:
+    name: str
+    status: str                 # какой статус сканируем
+    older_than: timedelta       # сколько тикет должен пролежать без изменений
+    interval: timedelta         # как часто запускать
+    # (db, батч, крайний срок по time.monotonic()) -> (сколько тикетов с начала батча
+    # обработано — до них двигаем водяной знак, сколько строк реально затронуто)
+    action: Callable[[Session, List[models.Ticket], float], Tuple[int, int]]
+
+
+@dataclass
+class Job:
+    name: str
+    interval: timedelta
+    # (db, состояние задачи с водяным знаком, время запуска, report);
+    # report(n) вызывается после каждого закоммиченного батча и продлевает аренду
+    run: Callable[[Session, models.ScheduledJob, datetime, Callable[[int], None]], None]
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def lease_length(interval: timedelta) -> timedelta:
+    return max(interval, timedelta(minutes=1))
+
+
+# ===== Действия правил =====
+
+def send_telegram(chat_id: str, text: str) -> bool:
+    data = json.dumps({"chat_id": chat_id, "text": text}).encode()
+    req = urllib.request.Request(
+        f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
+        data=data,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        urllib.request.urlopen(req, timeout=REMINDER_SEND_TIMEOUT_SEC).close()
+        return True
+    except urllib.error.HTTPError as exc:
+        if exc.code == 429:
+            logger.warning("Telegram ограничивает частоту (429), напоминания продолжим позже")
+        else:
+            logger.exception("Не удалось отправить напоминание в чат %s", chat_id)
+    except Exception:
+        logger.exception("Не удалось отправить напоминание в чат %s", chat_id)
+    return False
+
+
+def remind_assignee(db: Session, tickets: List[models.Ticket], deadline: float) -> Tuple[int, int]:
+    if not BOT_TOKEN:
+        # водяной знак не двигаем — напоминания уйдут, когда токен появится
+        logger.warning("BOT_TOKEN не задан, напоминания не отправляются")
+        return 0, 0
+
+    sent = 0
+    for done, ticket in enumerate(tickets):
+        chat_id = ticket.assignee.tg_id if ticket.assignee else REMINDER_CHAT_ID
+        if not chat_id:
+            continue
+        if sent:
+            time.sleep(REMINDER_SEND_INTERVAL_SEC)
+        if time.monotonic() + REMINDER_SEND_TIMEOUT_SEC > deadline:
+            return done, sent
+        ok = send_telegram(
+            chat_id,
+            f"Обращение #{ticket.id} ({ticket.type}) висит в статусе «новое» "
+            f"дольше {REMIND_NEW_AFTER_HOURS:g} ч.",
+        )
+        if not ok:
+            # останавливаемся перед этим тикетом — повторим в следующий запуск
+            return done, sent
+        sent += 1
+    return len(tickets), sent
+
+
+def auto_close(db: Session, tickets: List[models.Ticket], deadline: float) -> Tuple[int, int]:
+    changes = []
+    for ticket in tickets:
+        changes.append((ticket, ticket.status))
+        ticket.status = "closed"
+    if tickets:
+        activity.on_tickets_status_changed(db, changes)
+        bump_table_version(db, "tickets")
+        bump_table_version(db, "clients")
+    return len(tickets), len(tickets)
+
+
+RULES = [
+    Rule(
+        name="remind_new",
+        status="new",
+        older_than=timedelta(hours=REMIND_NEW_AFTER_HOURS),
+        interval=timedelta(minutes=5),
+        action=remind_assignee,
+    ),
+    Rule(
+        name="autoclose_waiting",
+        status="waiting",
+        older_than=timedelta(days=AUTOCLOSE_WAITING_AFTER_DAYS),
+        interval=timedelta(minutes=30),
+        action=auto_close,
+    ),
+]
+
+
+def rule_job(rule: Rule) -> Job:
+    return Job(
+        name=rule.name,
+        interval=rule.interval,
+        run=lambda db, state, now, report: run_rule(db, rule, state, now, report),
+    )
+
+
+JOBS = [rule_job(rule) for rule in RULES] + [
+    Job(name="rollup_clients", interval=timedelta(minutes=5), run=refresh_client_rollup),
+    Job(name="rollup_tickets", interval=timedelta(minutes=5), run=refresh_ticket_rollup),
+    Job(name="repair_client_activity", interval=timedelta(hours=24), run=activity.repair_job),
+]
+
+
+# ===== Аренда задачи (только один воркер выполняет задачу) =====
+
+def ensure_jobs(db: Session):
+    insert_missing(db, models.ScheduledJob, [{"name": job.name} for job in JOBS])
+    db.commit()
+
+
+def acquire_job(db: Session, task: Job, now: datetime) -> bool:
+    # атомарный UPDATE: строку получает тот, кто успел первым,
+    # и только если пора запускать и прошлая аренда истекла
+    job = models.ScheduledJob
+    lease = lease_length(task.interval)
+    taken = (
+        db.query(job)
+        .filter(
+            job.name == task.name,
+            or_(job.locked_until.is_(None), job.locked_until < now, job.owner == WORKER_ID),
+            or_(job.last_run_at.is_(None), job.last_run_at <= now - task.interval),
+        )
+        .update(
+            {job.owner: WORKER_ID, job.locked_until: now + lease},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return taken == 1
+
+
+def renew_lease(db: Session, task: Job):
+    # продлеваем только свою и ещё живую аренду; иначе задачу уже мог взять другой воркер
+    job = models.ScheduledJob
+    now = utcnow()
+    renewed = (
+        db.query(job)
+        .filter(job.name == task.name, job.owner == WORKER_ID, job.locked_until >= now)
+        .update({job.locked_until: now + lease_length(task.interval)}, synchronize_session=False)
+    )
+    db.commit()
+    if not renewed:
+        raise LeaseLost(task.name)
+
+
+# ===== Скан батчами по ключу (status, updated_at, id) =====
+
+def run_rule(db: Session, rule: Rule, state: models.ScheduledJob, now: datetime, report):
+    cutoff = now - rule.older_than
+    wm_at, wm_id = state.watermark_at, state.watermark_id
+    lease_sec = lease_length(rule.interval).total_seconds()
+
+    while True:
+        # аренда только что взята или продлена в report() — батч должен уложиться в неё
+        deadline = time.monotonic() + lease_sec - LEASE_MARGIN_SEC
+        q = (
+            db.query(models.Ticket)
+            .options(joinedload(models.Ticket.assignee))
+            .filter(
+                models.Ticket.status == rule.status,
+                models.Ticket.updated_at <= cutoff,
+            )
+            .order_by(models.Ticket.updated_at, models.Ticket.id)
+        )
+        if wm_at is not None:
+            # (updated_at, id) > (wm_at, wm_id); ">= wm_at" записано как "> wm_at - 1 мкс",
+            # т.к. SQLite хранит CURRENT_TIMESTAMP без микросекунд и "==" с параметром не совпадает
+            q = q.filter(
+                and_(
+                    models.Ticket.updated_at > wm_at - timedelta(microseconds=1),
+                    or_(models.Ticket.updated_at > wm_at, models.Ticket.id > wm_id),
+                )
+            )
+        batch = q.limit(SCHEDULER_BATCH_SIZE).all()
+        if not batch:
+            break
+
+        # ключи берём до действия: auto_close меняет updated_at
+        keys = [(ticket.updated_at, ticket.id) for ticket in batch]
+        done, touched = rule.action(db, batch, deadline)
+
+        if done:
+            wm_at, wm_id = keys[done - 1]
+            state.watermark_at, state.watermark_id = wm_at, wm_id
+        db.commit()
+        report(touched)
+
+        if done < len(batch) or len(batch) < SCHEDULER_BATCH_SIZE:
+            break
+
+
+def run_job(task: Job) -> Optional[models.JobRun]:
+    with SessionLocal() as db:
+        now = utcnow()
+        if not acquire_job(db, task, now):
+            return None
+
+        started = time.perf_counter()
+        touched = 0
+        error = None
+
+        def report(count: int):
+            # считаем только закоммиченные батчи, чтобы сбой позже не обнулил счётчик
+            nonlocal touched
+            touched += count
+            renew_lease(db, task)
+
+        try:
+            state = db.query(models.ScheduledJob).filter(models.ScheduledJob.name == task.name).one()
+            task.run(db, state, now, report)
+        except LeaseLost:
+            db.rollback()
+            logger.error("Аренда задачи %s истекла, останавливаем запуск", task.name)
+            error = "lease lost"
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Ошибка в фоновой задаче %s", task.name)
+            error = repr(exc)
+
+        run = models.JobRun(
+            job_name=task.name,
+            worker=WORKER_ID,
+            started_at=now,
+            duration_ms=int((time.perf_counter() - started) * 1000),
+            rows_touched=touched,
+            error=error,
+        )
+        db.add(run)
+        # снимаем аренду, только если она всё ещё наша
+        db.query(models.ScheduledJob).filter(
+            models.ScheduledJob.name == task.name,
+            models.ScheduledJob.owner == WORKER_ID,
+        ).update(
+            {
+                models.ScheduledJob.last_run_at: now,
+                models.ScheduledJob.locked_until: None,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        db.refresh(run)
+        return run
+
+
+# ===== Цикл планировщика =====
+
+def prepare_jobs():
+    with SessionLocal() as db:
+        ensure_jobs(db)
+
+
+async def scheduler_loop():
+    jobs_ready = False
+    while True:
+        if not jobs_ready:
+            # без строк задач аренда не сработает; при сбое пробуем на следующем тике
+            try:
+                await asyncio.to_thread(prepare_jobs)
+                jobs_ready = True
+            except Exception:
+                logger.exception("Планировщик: не удалось подготовить задачи")
+                await asyncio.sleep(SCHEDULER_TICK_SEC)
+                continue
+
+        for task in JOBS:
+            try:
+                # работа с БД синхронная — уводим в поток, чтобы не блокировать event loop
+                await asyncio.to_thread(run_job, task)
+            except Exception:
+                logger.exception("Планировщик: сбой при запуске %s", task.name)
+        await asyncio.sleep(SCHEDULER_TICK_SEC)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 from typing import Optional
 
@@ -20,6 +20,9 @@ class ClientCreate(ClientBase):
 class Client(ClientBase):
     id: int
     created_at: datetime
+    open_tickets: int = 0
+    total_tickets: int = 0
+    last_ticket_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -62,4 +65,34 @@ class Ticket(BaseModel):
     client: Optional[ClientShort] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# ===== Фоновые задачи =====
+
+class JobRun(BaseModel):
+    id: int
+    job_name: str
+    worker: str
+    started_at: datetime
+    duration_ms: int
+    rows_touched: int
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+# ===== Аналитика =====
+
+class ClientAcquisitionRow(BaseModel):
+    period_start: date
+    source: Optional[str] = None
+    city: Optional[str] = None
+    clients: int
+
+
+class TicketVolumeRow(BaseModel):
+    period_start: date
+    type: str
+    tickets: int
@@ -0,0 +1,291 @@
+"""Нагрузочный замер бота (bot/bot.py) без настоящего Telegram.
+
+Поднимает локальный фейковый Bot API (getMe / getUpdates / sendMessage / ...),
+подаёт синтетические апдейты "/start" с заданной частотой и меряет:
+задержку обработчика (от подачи апдейта до sendMessage), частоту исходящих
+запросов и рост памяти. Режимы: polling (через getUpdates) и webhook
+(апдейты POST-ом в aiohttp-обработчик aiogram).
+
+    python bench/bot_throughput.py --mode polling --rate 200 --duration 20 --out polling.json
+    python bench/bot_throughput.py --mode webhook --rate 500 --baseline polling.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+# bot/bot.py читает настройки при импорте — подставляем безопасные значения
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("WEBAPP_URL", "https://example.com/webapp")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler  # noqa: E402
+
+from bot import dp  # noqa: E402
+
+HOST = "127.0.0.1"
+FIRST_CHAT_ID = 100_000
+
+
+# ===== Фейковый Bot API =====
+
+class FakeBotAPI:
+    def __init__(self):
+        self.updates: List[dict] = []
+        self.new_updates = asyncio.Event()
+        self.next_update_id = 1
+        self.next_message_id = 1
+
+        self.sent_at: Dict[int, float] = {}       # chat_id -> когда подали апдейт
+        self.latencies: List[float] = []
+        self.outbound = 0
+        self.first_outbound: Optional[float] = None
+        self.last_outbound: Optional[float] = None
+
+    def make_update(self, chat_id: int) -> dict:
+        update = {
+            "update_id": self.next_update_id,
+            "message": {
+                "message_id": self.next_update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+                "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+        self.next_update_id += 1
+        return update
+
+    def push(self, update: dict):
+        self.updates.append(update)
+        self.new_updates.set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method == "getUpdates":
+            result = await self.get_updates(params)
+        elif method == "sendMessage":
+            result = self.record_message(params)
+        else:
+            # deleteWebhook, setWebhook, close и прочее — просто "ок"
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        timeout = float(params.get("timeout", 0))
+
+        # подтверждённые апдейты (id < offset) выкидываем, как настоящий Telegram
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    def record_message(self, params: dict) -> dict:
+        now = time.perf_counter()
+        chat_id = int(params["chat_id"])
+        self.outbound += 1
+        self.first_outbound = self.first_outbound or now
+        self.last_outbound = now
+
+        started = self.sent_at.pop(chat_id, None)
+        if started is not None:
+            self.latencies.append(now - started)
+
+        message_id = self.next_message_id
+        self.next_message_id += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+
+async def start_site(app: web.Application, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, port).start()
+    return runner
+
+
+# ===== Подача апдейтов =====
+
+async def inject(api: FakeBotAPI, rate: float, duration: float, deliver):
+    # апдейт i подаём в момент start + i / rate; если отстаём — догоняем без сна
+    total = int(rate * duration)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        chat_id = FIRST_CHAT_ID + i
+        update = api.make_update(chat_id)
+        api.sent_at[chat_id] = time.perf_counter()
+        await deliver(update)
+    return total, time.perf_counter() - start
+
+
+async def wait_drained(api: FakeBotAPI, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while api.sent_at and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[index]
+
+
+async def run(args) -> dict:
+    api = FakeBotAPI()
+    api_app = web.Application()
+    api_app.router.add_route("*", "/bot{token}/{method}", api.handle)
+    api_runner = await start_site(api_app, args.api_port)
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://{HOST}:{args.api_port}"))
+    bench_bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    # tracemalloc заметно замедляет обработчики, поэтому включается отдельно
+    if args.trace_heap:
+        tracemalloc.start()
+    rss_before = rss_bytes()
+    heap_before = tracemalloc.get_traced_memory()[0]
+
+    runners = [api_runner]
+    if args.mode == "polling":
+        polling = asyncio.create_task(
+            dp.start_polling(bench_bot, handle_signals=False, polling_timeout=1)
+        )
+
+        async def deliver(update):
+            api.push(update)
+    else:
+        hook_app = web.Application()
+        SimpleRequestHandler(dispatcher=dp, bot=bench_bot).register(hook_app, path="/webhook")
+        runners.append(await start_site(hook_app, args.webhook_port))
+        client = ClientSession()
+        webhook_url = f"http://{HOST}:{args.webhook_port}/webhook"
+
+        async def deliver(update):
+            async with client.post(webhook_url, json=update) as resp:
+                resp.release()
+
+    injected, inject_sec = await inject(api, args.rate, args.duration, deliver)
+    await wait_drained(api, args.drain_timeout)
+
+    heap_after, heap_peak = tracemalloc.get_traced_memory()
+    rss_after = rss_bytes()
+    if args.trace_heap:
+        tracemalloc.stop()
+
+    if args.mode == "polling":
+        await dp.stop_polling()
+        await polling
+    else:
+        await client.close()
+    for runner in runners:
+        await runner.cleanup()
+    await bench_bot.session.close()
+
+    outbound_sec = (api.last_outbound or 0) - (api.first_outbound or 0)
+    latencies_ms = [x * 1000 for x in api.latencies]
+    return {
+        "mode": args.mode,
+        "target_rate": args.rate,
+        "duration_sec": args.duration,
+        "injected": injected,
+        "injected_rate": round(injected / inject_sec, 1) if inject_sec else 0,
+        "handled": len(api.latencies),
+        "lost": len(api.sent_at),
+        "outbound_requests": api.outbound,
+        "outbound_rate": round(api.outbound / outbound_sec, 1) if outbound_sec else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 0.50), 2),
+            "p90": round(percentile(latencies_ms, 0.90), 2),
+            "p99": round(percentile(latencies_ms, 0.99), 2),
+            "max": round(max(latencies_ms, default=0), 2),
+        },
+        "memory": {
+            "rss_growth_bytes": rss_after - rss_before,
+            "heap_growth_bytes": heap_after - heap_before if args.trace_heap else None,
+            "heap_peak_bytes": heap_peak if args.trace_heap else None,
+        },
+    }
+
+
+# ===== Сравнение с сохранённым замером =====
+
+COMPARED = [
+    ("handled", lambda r: r["handled"]),
+    ("outbound_rate", lambda r: r["outbound_rate"]),
+    ("latency p50, ms", lambda r: r["latency_ms"]["p50"]),
+    ("latency p99, ms", lambda r: r["latency_ms"]["p99"]),
+    ("rss growth, bytes", lambda r: r["memory"]["rss_growth_bytes"]),
+]
+
+
+def compare(result: dict, baseline: dict):
+    print(f"\nсравнение с baseline ({baseline['mode']}, {baseline['target_rate']}/s):")
+    for name, get in COMPARED:
+        old, new = get(baseline), get(result)
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {name:<20} {old:>14} -> {new:>14}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    parser.add_argument("--rate", type=float, default=100, help="апдейтов в секунду")
+    parser.add_argument("--duration", type=float, default=10, help="сколько секунд подавать апдейты")
+    parser.add_argument("--drain-timeout", type=float, default=10, help="сколько ждать хвост ответов")
+    parser.add_argument("--trace-heap", action="store_true", help="мерить рост Python-heap (tracemalloc)")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook-port", type=int, default=8082)
+    parser.add_argument("--out", type=Path, help="сохранить результат как JSON (baseline)")
+    parser.add_argument("--baseline", type=Path, help="JSON прошлого замера для сравнения")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.out:
+        args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.baseline:
+        compare(result, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Замер рендера мини-приложения (/webapp) в headless Chromium.
+
+API подменяется синтетическими данными (N клиентов и N тикетов), сам HTML
+берётся из backend/app/templates/webapp.html. Считаем время первой отрисовки,
+полной подгрузки всех страниц, время кадра при скролле, число DOM-узлов и JS heap.
+
+    pip install playwright && playwright install chromium
+    python bench/webapp_render.py --rows 10000 100000 --cpu-throttle 4 --out webapp.json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from playwright.sync_api import sync_playwright
+
+# HTML читаем напрямую: импорт app.main создал бы crm.db и включил бы echo SQL
+WEBAPP_HTML = Path(__file__).resolve().parent.parent / "backend" / "app" / "templates" / "webapp.html"
+
+BASE_URL = "http://crm.local"
+STATUSES = ["new", "in_progress", "waiting", "closed"]
+TYPES = ["order", "question", "warranty", "job", "other"]
+
+
+def make_client(i: int) -> dict:
+    return {
+        "id": i,
+        "name": f"Клиент {i}",
+        "phone": f"7999{i:07d}",
+        "city": "СПБ",
+        "source": "qr",
+        "tg_id": None,
+        "created_at": "2025-01-01T00:00:00",
+    }
+
+
+def make_ticket(i: int) -> dict:
+    return {
+        "id": i,
+        "client_id": i,
+        "type": TYPES[i % len(TYPES)],
+        "status": STATUSES[i % len(STATUSES)],
+        "last_comment": f"Комментарий к обращению {i}",
+        "created_at": "2025-01-01T00:00:00",
+        "updated_at": "2025-01-01T00:00:00",
+        "client": {"id": i, "name": f"Клиент {i}", "phone": None, "city": "СПБ"},
+    }
+
+
+def page_of(make, rows: int, query: dict) -> list:
+    # та же семантика, что у API: id по убыванию, курсор before_id
+    before_id = int(query.get("before_id", [rows + 1])[0])
+    limit = int(query.get("limit", [50])[0])
+    top = min(before_id - 1, rows)
+    return [make(i) for i in range(top, max(top - limit, 0), -1)]
+
+
+def install_routes(page, rows: int):
+    html = WEBAPP_HTML.read_text(encoding="utf-8")
+
+    def handle(route):
+        url = urlparse(route.request.url)
+        query = parse_qs(url.query)
+        if url.path == "/webapp":
+            route.fulfill(status=200, content_type="text/html", body=html)
+        elif url.path == "/clients":
+            route.fulfill(status=200, json=page_of(make_client, rows, query))
+        elif url.path == "/tickets":
+            route.fulfill(status=200, json=page_of(make_ticket, rows, query))
+        else:
+            # telegram-web-app.js и прочее внешнее не нужно для замера
+            route.fulfill(status=200, content_type="application/javascript", body="")
+
+    page.route("**/*", handle)
+
+
+def heap_used(cdp) -> int:
+    cdp.send("HeapProfiler.collectGarbage")
+    metrics = {m["name"]: m["value"] for m in cdp.send("Performance.getMetrics")["metrics"]}
+    return int(metrics["JSHeapUsedSize"])
+
+
+def load_all(page, list_name: str, timeout: float) -> float:
+    # крутим список вниз, пока пейджер не дойдёт до конца
+    started = time.perf_counter()
+    deadline = started + timeout
+    while not page.evaluate(f"{list_name}.done"):
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{list_name}: не догрузились за {timeout} с")
+        page.evaluate(f"{list_name}.el.scrollTop = {list_name}.el.scrollHeight")
+        page.wait_for_timeout(10)
+    return (time.perf_counter() - started) * 1000
+
+
+def scroll_frames(page, list_name: str, steps: int) -> dict:
+    # синхронно прогоняем render() в случайных позициях и меряем каждый кадр
+    timings = page.evaluate(
+        """([name, steps]) => {
+            const list = globalThis.eval(name);
+            const max = list.el.scrollHeight - list.el.clientHeight;
+            const out = [];
+            for (let i = 0; i < steps; i++) {
+                list.el.scrollTop = Math.random() * max;
+                const t0 = performance.now();
+                list.render();
+                out.push(performance.now() - t0);
+            }
+            return out;
+        }""",
+        [list_name, steps],
+    )
+    timings.sort()
+    return {
+        "avg_ms": round(sum(timings) / len(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def measure(browser, rows: int, page_size: int, cpu_throttle: float, timeout: float) -> dict:
+    page = browser.new_page(viewport={"width": 390, "height": 844})
+    cdp = page.context.new_cdp_session(page)
+    cdp.send("Performance.enable")
+    if cpu_throttle > 1:
+        cdp.send("Emulation.setCPUThrottlingRate", {"rate": cpu_throttle})
+    install_routes(page, rows)
+
+    started = time.perf_counter()
+    page.goto(f"{BASE_URL}/webapp?page_size={page_size}")
+    page.wait_for_selector(".ticket-item")
+    first_render_ms = (time.perf_counter() - started) * 1000
+    heap_initial = heap_used(cdp)
+
+    result = {
+        "rows": rows,
+        "page_size": page_size,
+        "cpu_throttle": cpu_throttle,
+        "first_render_ms": round(first_render_ms, 1),
+        "heap_initial_bytes": heap_initial,
+    }
+    for list_name in ("clientsList", "ticketsList"):
+        result[list_name] = {
+            "load_all_ms": round(load_all(page, list_name, timeout), 1),
+            "scroll": scroll_frames(page, list_name, steps=200),
+            "rendered_rows": page.evaluate(f"{list_name}.rows.size"),
+        }
+    result["dom_nodes"] = page.evaluate("document.getElementsByTagName('*').length")
+    result["heap_loaded_bytes"] = heap_used(cdp)
+
+    page.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--cpu-throttle", type=float, default=4, help="замедление CPU (слабый телефон)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--out", type=Path, help="куда сохранить JSON с результатами")
+    args = parser.parse_args()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        results = [
+            measure(browser, rows, args.page_size, args.cpu_throttle, args.timeout)
+            for rows in args.rows
+        ]
+        browser.close()
+
+    report = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.write_text(report, encoding="utf-8")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()